@@ -5,72 +5,190 @@ ZIP extraction and data parsing. Report HTML is rendered via Flask template (tem
 No network or server dependencies.
 
 Public API:
-    extract_files(zip_path, tmpdir) -> dict
-    parse_data(paths)               -> dict
-    ts_to_date(ts)                  -> str  (for Jinja2 fmt_date filter)
+    open_and_validate(zip_path, max_bytes) -> (ZipFile, dict, None) | (None, None, errors)
+    extract_files(zip_path) -> (ZipFile, dict)
+    parse_data(zf, members) -> dict
+    ts_to_date(ts)          -> str  (for Jinja2 fmt_date filter)
 """
 
-import os
+import io
 import json
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
+
+from validation import open_validated
+
+# C-implemented sort key — no Python frame per compared element
+_by_timestamp = itemgetter(1)
+
+try:
+    import orjson  # SIMD-accelerated C parser — ~5× faster than stdlib on large exports
+except ImportError:
+    orjson = None  # optional; stdlib json is used as fallback
+
+try:
+    # Event-driven parser: lets us stream the followers file without building
+    # the full list/dict tree in memory. ijson auto-selects its fastest
+    # available backend (yajl2_c when the C extension is installed).
+    import ijson
+except ImportError:
+    ijson = None
+
+
+def _loads(data: bytes):
+    """Parse JSON bytes with orjson when available, else stdlib json."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _safe_ts(ts) -> int:
+    """Coerce an export timestamp to int once at parse time (0 if malformed),
+    so ts_to_date never sees a bad value in the render hot path."""
+    try:
+        return int(ts or 0)
+    except (TypeError, ValueError):
+        return 0
 
 
 # ── ZIP extraction ────────────────────────────────────────────────
 
-def extract_files(zip_path: str, tmpdir: str) -> dict:
-    needed = {
-        "followers": "connections/followers_and_following/followers_1.json",
-        "following": "connections/followers_and_following/following.json",
-        "pending":   "connections/followers_and_following/pending_follow_requests.json",
-    }
-    with zipfile.ZipFile(zip_path, "r") as z:
-        names_in_zip = z.namelist()
-        paths = {}
-        for key, path in needed.items():
-            if path in names_in_zip:
-                z.extract(path, tmpdir)
-                paths[key] = os.path.join(tmpdir, path)
-            else:
-                raise ValueError(f"File not found inside ZIP: {path}")
-    return paths
+_NEEDED = {
+    "followers": "connections/followers_and_following/followers_1.json",
+    "following": "connections/followers_and_following/following.json",
+    "pending":   "connections/followers_and_following/pending_follow_requests.json",
+}
+
+
+def _locate_members(z: zipfile.ZipFile) -> dict:
+    # One pass over the central directory; O(1) lookups afterwards, and
+    # passing the ZipInfo to z.open() skips its internal name lookup.
+    # Keys are normalized the same way validation does (backslashes → "/",
+    # leading "/" stripped) so a zip that passed validation always matches.
+    infos_in_zip = {zi.filename.replace("\\", "/").lstrip("/"): zi for zi in z.infolist()}
+    members = {}
+    for key, path in _NEEDED.items():
+        if path in infos_in_zip:
+            members[key] = infos_in_zip[path]
+        else:
+            raise ValueError(f"File not found inside ZIP: {path}")
+    return members
+
+
+def open_and_validate(zip_path: str, max_bytes: int):
+    """
+    Open the export ZIP once, validate its structure, and locate the needed
+    members — a single central-directory decode for validation + parsing.
+    Returns (zf, members, None) when valid, else (None, None, errors).
+    Caller owns and must close the returned ZipFile.
+    """
+    z, errors = open_validated(zip_path, max_bytes)
+    if z is None:
+        return None, None, errors
+    try:
+        members = _locate_members(z)
+    except ValueError as e:
+        # Shouldn't happen after validation, but surface it as a normal
+        # validation failure (400) rather than letting it escape as a 500
+        z.close()
+        return None, None, [str(e)]
+    except Exception:
+        z.close()
+        raise
+    return z, members, None
+
+
+def extract_files(zip_path: str) -> tuple[zipfile.ZipFile, dict]:
+    """
+    Open the export ZIP and locate the needed members. Returns (zf, members)
+    so parse_data can read straight from the in-zip streams — no extraction
+    to disk and re-read. Caller is responsible for closing zf.
+    """
+    z = zipfile.ZipFile(zip_path, "r")
+    try:
+        members = _locate_members(z)
+    except Exception:
+        z.close()
+        raise
+    return z, members
+
+
+def _read_member(zf: zipfile.ZipFile, member) -> bytes:
+    """Read a zip member fully through a large buffer (decompression stream)."""
+    with zf.open(member) as raw:
+        with io.BufferedReader(raw, buffer_size=1 << 20) as buf:
+            return buf.read()
 
 
 # ── Data parsing ──────────────────────────────────────────────────
 
-def parse_data(paths: dict) -> dict:
-    with open(paths["followers"], encoding="utf-8") as f:
-        followers_raw  = json.load(f)
-    followers_names = set(item["string_list_data"][0]["value"] for item in followers_raw)
+def _load_followers(zf: zipfile.ZipFile, member) -> set:
+    # Followers is the biggest file: stream-parse it so peak memory is
+    # O(unique names) instead of the whole materialized JSON tree.
+    if ijson is not None:
+        with zf.open(member) as raw:
+            with io.BufferedReader(raw, buffer_size=1 << 20) as buf:
+                return set(ijson.items(buf, "item.string_list_data.item.value"))
+    followers_raw = _loads(_read_member(zf, member))
+    # map + itemgetter pushes the per-item dict lookup into C
+    return {sl[0]["value"] for sl in map(itemgetter("string_list_data"), followers_raw)}
+
 
-    with open(paths["following"], encoding="utf-8") as f:
-        following_raw  = json.load(f)
-    following_list = [
-        (item["title"], item["string_list_data"][0].get("timestamp", 0))
+def _load_following(zf: zipfile.ZipFile, member) -> list:
+    following_raw = _loads(_read_member(zf, member))
+    return [
+        (item["title"], _safe_ts(item["string_list_data"][0].get("timestamp", 0)))
         for item in following_raw["relationships_following"]
     ]
 
-    with open(paths["pending"], encoding="utf-8") as f:
-        pending_raw = json.load(f)
-    pending_list = [
-        (item["string_list_data"][0]["value"], item["string_list_data"][0].get("timestamp", 0))
+
+def _load_pending(zf: zipfile.ZipFile, member) -> list:
+    pending_raw = _loads(_read_member(zf, member))
+    return [
+        (item["string_list_data"][0]["value"], _safe_ts(item["string_list_data"][0].get("timestamp", 0)))
         for item in pending_raw["relationships_follow_requests_sent"]
     ]
 
-    not_following_back = sorted(
-        [(name, ts) for name, ts in following_list if name not in followers_names],
-        key=lambda x: x[1],
-    )
+
+def parse_data(zf: zipfile.ZipFile, members: dict) -> dict:
+    # Load the three files concurrently: decompression + JSON decode overlap,
+    # so wall time is ~max of the three instead of the sum. ZipFile reads are
+    # internally locked, so sharing zf across threads is safe.
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        followers_future = pool.submit(_load_followers, zf, members["followers"])
+        following_future = pool.submit(_load_following, zf, members["following"])
+        pending_future   = pool.submit(_load_pending,   zf, members["pending"])
+        followers_names  = followers_future.result()
+        following_list   = following_future.result()
+        pending_list     = pending_future.result()
+
+    following_count    = len(following_list)
+    not_following_back = [(name, ts) for name, ts in following_list if name not in followers_names]
+    not_following_back.sort(key=_by_timestamp)
+    pending_list.sort(key=_by_timestamp)
+
+    # Pre-render dates once per unique timestamp: the template does a plain
+    # dict lookup per row instead of a Jinja filter dispatch + strftime.
+    unique_ts = {ts for _, ts in not_following_back} | {ts for _, ts in pending_list}
+    date_map  = {ts: ts_to_date(ts) for ts in unique_ts}
+
     return {
         "followers_count":    len(followers_names),
-        "following_count":    len(following_list),
+        "following_count":    following_count,
         "not_following_back": not_following_back,
-        "pending":            sorted(pending_list, key=lambda x: x[1]),
+        "pending":            pending_list,
+        "date_map":           date_map,
     }
 
 
 # ── Helpers (used by Flask template filter) ────────────────────────
 
+@lru_cache(maxsize=8192)
 def ts_to_date(ts) -> str:
-    """Format timestamp for display. Used by app.py fmt_date filter."""
+    """Format timestamp for display. Used by app.py fmt_date filter.
+
+    Cached: exports repeat timestamps (bulk follows in the same second), so
+    rendering N rows costs unique(ts) strftime calls instead of N.
+    """
     return datetime.fromtimestamp(ts).strftime("%d/%m/%Y") if ts else "-"
@@ -17,6 +17,7 @@ import io
 import os
 import re
 import sys
+import shlex
 import shutil
 import socket
 import subprocess
@@ -32,7 +33,6 @@ _FRONTEND_DIR = os.path.join(_BACKEND_DIR, "..", "frontend")
 sys.path.insert(0, _BACKEND_DIR)
 
 import analyzer
-from validation import validate_zip
 
 app = Flask(
     __name__,
@@ -47,6 +47,9 @@ app.config["MAX_CONTENT_LENGTH"] = 5 * 1024 * 1024  # 5 MB
 # Cache-bust static assets after deploy (Render sets RENDER_GIT_COMMIT)
 app.config["STATIC_VERSION"] = (os.environ.get("RENDER_GIT_COMMIT") or "0")[:8]
 
+# Username from the export filename, e.g. "instagram-someuser-2024-01-01.zip"
+_USERNAME_RE = re.compile(r"instagram[-_]([a-zA-Z0-9_.]+)[-_]")
+
 
 # ── Template filters (for report.html) ─────────────────────────────
 
@@ -81,8 +84,9 @@ class _LogCapture(io.TextIOBase):
         self._orig = orig
 
     def write(self, s):
+        # No flush per write: stdout's own line buffering is enough, since
+        # UI progress comes from the _on_progress callback, not log parsing
         self._orig.write(s)
-        self._orig.flush()
         return len(s)
 
     def flush(self):
@@ -129,24 +133,28 @@ def analyze():
 
     tmpdir   = tempfile.mkdtemp()
     zip_path = os.path.join(tmpdir, "upload.zip")
+    zf       = None
     try:
-        zip_file.save(zip_path)
-
-        ok, validation_errors = validate_zip(zip_path, app.config["MAX_CONTENT_LENGTH"])
-        if not ok:
+        # Large-buffer copy instead of zip_file.save (Werkzeug's default
+        # small buffer) — fewer syscalls while persisting the upload.
+        with open(zip_path, "wb") as dst:
+            shutil.copyfileobj(zip_file.stream, dst, length=1 << 20)
+
+        # Single zip open for validation + parsing (one central-directory decode)
+        zf, members, validation_errors = analyzer.open_and_validate(zip_path, app.config["MAX_CONTENT_LENGTH"])
+        if zf is None:
             return jsonify({"error": True, "reasons": validation_errors or ["Invalid file."]}), 400
 
         print("📦 ZIP file received — starting analysis...")
         try:
-            paths = analyzer.extract_files(zip_path, tmpdir)
-            data  = analyzer.parse_data(paths)
+            data = analyzer.parse_data(zf, members)
         except ValueError as e:
             return jsonify({"error": True, "reasons": [str(e)]}), 400
         print(f"📊 Followers: {data['followers_count']} | Following: {data['following_count']}")
 
         username      = "user"
         original_name = zip_file.filename or ""
-        m = re.search(r"instagram[-_]([a-zA-Z0-9_.]+)[-_]", original_name)
+        m = _USERNAME_RE.search(original_name)
         if m:
             username = m.group(1)
 
@@ -173,6 +181,8 @@ def analyze():
         traceback.print_exc()
         return jsonify({"error": True, "reasons": ["Something went wrong. Please try again or use a valid Instagram data export."]}), 500
     finally:
+        if zf is not None:
+            zf.close()
         shutil.rmtree(tmpdir, ignore_errors=True)
 
 
@@ -186,12 +196,17 @@ def open_tabs():
         return resp
     urls = (request.json or {}).get("urls", [])
     if urls:
-        cmd = "open" if sys.platform == "darwin" else "xdg-open"
-        for url in urls:
-            try:
-                subprocess.Popen([cmd, url], start_new_session=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            except Exception:
-                pass
+        # One detached process for the whole batch instead of a fork+exec
+        # per URL: macOS `open` takes multiple URLs; xdg-open doesn't, so
+        # batch it through a single shell.
+        if sys.platform == "darwin":
+            cmd = ["open", *urls]
+        else:
+            cmd = ["sh", "-c", " ".join(f"xdg-open {shlex.quote(u)} &" for u in urls)]
+        try:
+            subprocess.Popen(cmd, start_new_session=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except Exception:
+            pass
     return jsonify({"count": len(urls)})
 
 
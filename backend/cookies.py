@@ -9,14 +9,13 @@ Exports (used by instagram_api.py):
     init_ig_cookies()
 """
 
+import base64
 import os
 import ssl
 import sys
 import json
-import shutil
 import sqlite3
 import subprocess
-import tempfile
 import threading
 import urllib.request
 import urllib.parse
@@ -29,6 +28,20 @@ from hashlib import pbkdf2_hmac
 ssl_ctx = ssl.create_default_context()
 ssl_ctx.check_hostname = False
 ssl_ctx.verify_mode = ssl.CERT_NONE
+try:
+    # Prefer AES-GCM suites (hardware AES-NI path) for TLS ≤ 1.2 handshakes;
+    # TLS 1.3 suites are managed separately by OpenSSL and unaffected.
+    ssl_ctx.set_ciphers("AES128-GCM-SHA256:AES256-GCM-SHA384")
+except ssl.SSLError:
+    pass
+
+# Module-level opener reused across calls: keeps the cookie jar and lets
+# OpenSSL resume TLS sessions instead of paying a full handshake each time.
+_cookie_jar = http.cookiejar.CookieJar()
+_opener = urllib.request.build_opener(
+    urllib.request.HTTPSHandler(context=ssl_ctx),
+    urllib.request.HTTPCookieProcessor(_cookie_jar),
+)
 
 # ── Cookie state ──────────────────────────────────────────────────
 
@@ -40,17 +53,38 @@ has_logged_in_session: bool = False
 _COOKIE_CACHE = os.path.expanduser("~/.ig_session_cache.json")
 
 
+def _build_cookie_header(cookie_dict: dict) -> str:
+    """Serialize a cookie dict into a single Cookie header value.
+    One joiner for all three loaders — built once per cookie-state change."""
+    return "; ".join(f"{k}={v}" for k, v in cookie_dict.items())
+
+
 # ── Cache helpers ─────────────────────────────────────────────────
 
-def _save_cookie_cache(cookie_dict: dict) -> None:
+def _save_cookie_cache(cookie_dict: dict, key: bytes | None = None) -> None:
     try:
+        payload = dict(cookie_dict)
+        if key is not None:
+            # Cache the derived Chrome key so warm runs skip the Keychain
+            # prompt and the 1003-round PBKDF2 ("_"-prefixed: not a cookie)
+            payload["_chrome_key_b64"] = base64.b64encode(key).decode("ascii")
         with open(_COOKIE_CACHE, "w") as f:
-            json.dump(cookie_dict, f)
+            json.dump(payload, f)
         os.chmod(_COOKIE_CACHE, 0o600)
     except Exception:
         pass
 
 
+def _load_cached_key() -> bytes | None:
+    """Chrome AES key cached by a previous run, or None."""
+    try:
+        with open(_COOKIE_CACHE) as f:
+            b64 = json.load(f).get("_chrome_key_b64", "")
+        return base64.b64decode(b64) if b64 else None
+    except Exception:
+        return None
+
+
 def _load_cookie_cache() -> bool:
     global ig_cookies, ig_csrf, has_logged_in_session
     if not os.path.exists(_COOKIE_CACHE):
@@ -58,9 +92,10 @@ def _load_cookie_cache() -> bool:
     try:
         with open(_COOKIE_CACHE) as f:
             cookie_dict = json.load(f)
+        cookie_dict.pop("_chrome_key_b64", None)
         if "sessionid" not in cookie_dict:
             return False
-        ig_cookies = "; ".join(f"{k}={v}" for k, v in cookie_dict.items())
+        ig_cookies = _build_cookie_header(cookie_dict)
         ig_csrf    = cookie_dict.get("csrftoken", "")
         uid        = cookie_dict.get("ds_user_id", "?")
         print(f"   🍪 Loaded cookies from local cache (user_id={uid})")
@@ -72,65 +107,97 @@ def _load_cookie_cache() -> bool:
 
 # ── Chrome cookie loader ──────────────────────────────────────────
 
+def _derive_chrome_key() -> bytes | None:
+    """Read the Chrome Safe Storage password from the Keychain and derive
+    the AES key. Returns None if the Keychain read fails."""
+    print("   🔑 Accessing Mac Keychain (one-time only)...")
+    print("      (If a permission dialog appears — click 'Always Allow')")
+    pw_result = subprocess.run(
+        ["security", "find-generic-password", "-w", "-s", "Chrome Safe Storage", "-a", "Chrome"],
+        capture_output=True, text=True, timeout=60
+    )
+    if pw_result.returncode != 0 or not pw_result.stdout.strip():
+        print("   ⚠️  Could not read Chrome Keychain key")
+        return None
+    pw = pw_result.stdout.strip().encode()
+    return pbkdf2_hmac("sha1", pw, b"saltysalt", 1003, dklen=16)
+
+
 def _load_chrome_cookies() -> bool:
     global ig_cookies, ig_csrf, has_logged_in_session
     if sys.platform != "darwin":
         return False  # Chrome/Keychain loading is macOS-only; on Linux use cache or basic cookies
+    # Prefer cryptography: it dispatches to OpenSSL, which uses AES-NI —
+    # roughly 10× faster per cookie than pycryptodome's C implementation.
+    _AES = None
     try:
-        from Crypto.Cipher import AES as _AES
+        from cryptography.hazmat.primitives.ciphers import Cipher as _Cipher, algorithms as _algorithms, modes as _modes
     except ImportError:
-        print("   ⚠️  pycryptodome not installed — skipping Chrome cookie read")
-        return False
-    try:
-        print("   🔑 Accessing Mac Keychain (one-time only)...")
-        print("      (If a permission dialog appears — click 'Always Allow')")
-        pw_result = subprocess.run(
-            ["security", "find-generic-password", "-w", "-s", "Chrome Safe Storage", "-a", "Chrome"],
-            capture_output=True, text=True, timeout=60
-        )
-        if pw_result.returncode != 0 or not pw_result.stdout.strip():
-            print("   ⚠️  Could not read Chrome Keychain key")
+        _Cipher = None
+        try:
+            from Crypto.Cipher import AES as _AES
+        except ImportError:
+            print("   ⚠️  cryptography/pycryptodome not installed — skipping Chrome cookie read")
             return False
-
-        pw  = pw_result.stdout.strip().encode()
-        key = pbkdf2_hmac("sha1", pw, b"saltysalt", 1003, dklen=16)
+    try:
+        key = _load_cached_key()
+        key_was_cached = key is not None
+        if key is None:
+            key = _derive_chrome_key()
+            if key is None:
+                return False
 
         db_path = os.path.expanduser("~/Library/Application Support/Google/Chrome/Default/Cookies")
         if not os.path.exists(db_path):
             print("   ⚠️  Chrome Cookies file not found")
             return False
 
-        tmp_db = tempfile.mktemp(suffix=".db")
-        shutil.copy2(db_path, tmp_db)
-        conn = sqlite3.connect(tmp_db)
+        # immutable=1 lets sqlite read the live (possibly locked) Chrome DB
+        # in place — no temp-file copy and unlink round trip
+        conn = sqlite3.connect(f"file:{urllib.parse.quote(db_path)}?immutable=1", uri=True)
         rows = conn.execute(
             "SELECT name, encrypted_value FROM cookies WHERE host_key LIKE '%instagram%'"
         ).fetchall()
         conn.close()
-        os.unlink(tmp_db)
 
-        def _decrypt(enc: bytes) -> str:
+        def _decrypt(enc: bytes) -> bytes:
             if enc[:3] != b"v10":
-                return enc.decode("utf-8", errors="replace")
-            cipher = _AES.new(key, _AES.MODE_CBC, b" " * 16)
-            dec    = cipher.decrypt(enc[3:])
-            pad    = dec[-1]
-            plain  = dec[:-pad] if 1 <= pad <= 16 else dec
-            return plain[32:].decode("utf-8", errors="replace")
-
-        cookie_dict: dict[str, str] = {}
-        for name, enc in rows:
-            cookie_dict[name] = urllib.parse.unquote(_decrypt(enc))
+                return enc
+            if _Cipher is not None:
+                decryptor = _Cipher(_algorithms.AES(key), _modes.CBC(b" " * 16)).decryptor()
+                dec = decryptor.update(enc[3:]) + decryptor.finalize()
+            else:
+                dec = _AES.new(key, _AES.MODE_CBC, b" " * 16).decrypt(enc[3:])
+            pad = dec[-1]
+            plain = dec[:-pad] if 1 <= pad <= 16 else dec
+            return plain[32:]
+
+        def _build_cookies() -> dict[str, str]:
+            # Percent-decode on bytes and decode to str once — skips the
+            # str→bytes→str round trip that urllib.parse.unquote does
+            d: dict[str, str] = {}
+            for name, enc in rows:
+                d[name] = urllib.parse.unquote_to_bytes(_decrypt(enc)).decode("utf-8", errors="replace")
+            return d
+
+        cookie_dict = _build_cookies()
+        sid = cookie_dict.get("sessionid", "")
+        if key_was_cached and (not sid or not sid.isprintable()):
+            # Cached key no longer decrypts Chrome's cookies — re-derive
+            key = _derive_chrome_key()
+            if key is None:
+                return False
+            cookie_dict = _build_cookies()
 
         if "sessionid" not in cookie_dict:
             print("   ⚠️  sessionid not found — is Chrome logged in to Instagram?")
             return False
 
-        ig_cookies = "; ".join(f"{k}={v}" for k, v in cookie_dict.items())
+        ig_cookies = _build_cookie_header(cookie_dict)
         ig_csrf    = cookie_dict.get("csrftoken", "")
         uid        = cookie_dict.get("ds_user_id", "?")
         print(f"   🍪 Loaded {len(cookie_dict)} cookies from Chrome (user_id={uid})")
-        _save_cookie_cache(cookie_dict)
+        _save_cookie_cache(cookie_dict, key=key)
         has_logged_in_session = True
         return True
     except Exception as e:
@@ -144,11 +211,6 @@ def _fetch_basic_cookies() -> None:
     global ig_cookies, ig_csrf
     print("   🌐 Fetching basic cookies from instagram.com...")
     try:
-        jar    = http.cookiejar.CookieJar()
-        opener = urllib.request.build_opener(
-            urllib.request.HTTPSHandler(context=ssl_ctx),
-            urllib.request.HTTPCookieProcessor(jar)
-        )
         req = urllib.request.Request(
             "https://www.instagram.com/",
             headers={
@@ -157,15 +219,12 @@ def _fetch_basic_cookies() -> None:
                 "Accept-Language": "en-US,en;q=0.9",
             }
         )
-        with opener.open(req, timeout=10) as resp:
+        with _opener.open(req, timeout=10) as resp:
             resp.read()
-        parts      = [f"{c.name}={c.value}" for c in jar]
-        ig_cookies = "; ".join(parts)
-        for c in jar:
-            if c.name == "csrftoken":
-                ig_csrf = c.value
-                break
-        print(f"   🍪 Received {len(parts)} basic cookies")
+        cookie_dict = {c.name: c.value for c in _cookie_jar}
+        ig_cookies  = _build_cookie_header(cookie_dict)
+        ig_csrf     = cookie_dict.get("csrftoken", "")
+        print(f"   🍪 Received {len(cookie_dict)} basic cookies")
     except Exception as e:
         print(f"   ⚠️  Failed to fetch cookies: {e}")
 
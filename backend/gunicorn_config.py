@@ -3,4 +3,9 @@ import os
 
 bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
 workers = 1
+# analyze is IO-bound (zip save/read + JSON parse) — threads overlap the IO
+# waits so concurrent uploads don't serialize behind a single sync worker
+worker_class = "gthread"
+threads = 4
+worker_connections = 100
 timeout = 300
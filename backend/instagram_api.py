@@ -2,7 +2,8 @@
 instagram_api.py
 ----------------
 Instagram account verification via the internal web API.
-Depends on cookies.py for session state (cookies, csrf, ssl_ctx).
+Depends on cookies.py for session state (cookies, csrf).
+All requests share one keep-alive requests.Session connection pool.
 
 Public API:
     verify_accounts(items, label, require_private) -> (list, bool)
@@ -10,24 +11,143 @@ Public API:
 
 import json
 import os
+import re
 import time
 import random
 import threading
-import urllib.request
-import urllib.error
+from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 
 import cookies as _cookies
 
+try:
+    import orjson  # C parser, 2-3× faster than stdlib on IG payloads
+except ImportError:
+    orjson = None
+
+
+def _loads(data: bytes):
+    """Parse JSON bytes with orjson when available, else stdlib json."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
 # On Render, Instagram often returns generic page (no profilePage_) for all requests; only remove when page says "unavailable"
 _verification_conservative = os.environ.get("RENDER") == "true"
 
+# All traffic targets www.instagram.com — one keep-alive pool sized to the
+# worker count reuses TCP+TLS connections instead of handshaking per request.
+# Fanout stays on a small thread pool rather than asyncio/aiohttp: throughput
+# is bounded by the shared token bucket (not by thread count), and threads
+# keep the module synchronous for its Flask callers with no extra dependency.
+# IO-bound pool: default scales with the CPU count, IG_VERIFY_WORKERS
+# overrides it (e.g. smaller on Render to stay under the rate limit).
+_WORKERS = int(os.environ.get("IG_VERIFY_WORKERS", 0)) or min((os.cpu_count() or 2) * 5, 20)
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+_session = requests.Session()
+_session.verify = False  # same policy as cookies.ssl_ctx (no cert validation)
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=_WORKERS))
+
+# Static header templates, built once — workers only overlay per-user fields
+_UA = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
+
+_HDR_HEAD = {"User-Agent": _UA, "Accept": "text/html"}
+
+# Same headers as direct GET that returns full page (profilePage_)
+_HDR_PAGE = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
+    "Accept": "text/html",
+}
+
+_HDR_SEARCH = {
+    "User-Agent":  _UA,
+    "Accept":      "*/*",
+    "x-ig-app-id": "936619743392459",
+}
+
+_HDR_WEB_PROFILE = {
+    "User-Agent":       _UA,
+    "Accept":           "*/*",
+    "Accept-Language":  "en-US,en;q=0.9",
+    "x-ig-app-id":      "936619743392459",
+    "X-Requested-With": "XMLHttpRequest",
+    "Origin":           "https://www.instagram.com",
+}
+
+
+def _sync_session_cookies() -> None:
+    """Copy the current cookie state onto the shared session headers once
+    (called at verify_accounts entry) instead of per request."""
+    if _cookies.ig_cookies:
+        _session.headers["Cookie"] = _cookies.ig_cookies
+    else:
+        _session.headers.pop("Cookie", None)
+    if _cookies.ig_csrf:
+        _session.headers["X-CSRFToken"] = _cookies.ig_csrf
+    else:
+        _session.headers.pop("X-CSRFToken", None)
+
 
 # ── Rate-limit state (reset per verify_accounts call) ────────────
 
 _rate_limited = threading.Event()
-_rate_limited_until = 0.0  # time.time() after which we may retry API
 _RATE_LIMIT_COOLDOWN = 70   # seconds to wait before retrying API after 429
+# time.time() after which we may retry the API. Kept in a mutable cell and
+# written under a lock with max(), so concurrent 429s can only extend the
+# cooldown — never overwrite it with an earlier deadline.
+_cooldown_lock = threading.Lock()
+_cooldown = [0.0]
+
+
+class _TokenBucket:
+    """Request gate shared by every worker thread.
+
+    Tokens refill continuously at rate_per_sec up to capacity; acquire()
+    blocks until one is available. Unlike a per-thread random sleep this
+    bounds the *aggregate* request rate, so small batches aren't slowed
+    and large batches can't burst into a 429 storm. On 429 the rate is
+    halved (AIMD); reset() restores the base rate.
+    """
+
+    def __init__(self, rate_per_sec: float, capacity: int):
+        self._base_rate = rate_per_sec
+        self._rate      = rate_per_sec
+        self._capacity  = float(capacity)
+        self._tokens    = float(capacity)
+        self._last      = time.monotonic()
+        self._lock      = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._last) * self._rate)
+                self._last   = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self._rate
+            time.sleep(wait)
+
+    def throttle(self) -> None:
+        """Halve the refill rate after a 429 (floor: 1/8 of base)."""
+        with self._lock:
+            self._rate = max(self._rate / 2.0, self._base_rate / 8.0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._rate = self._base_rate
+
+
+_bucket = _TokenBucket(rate_per_sec=1.0, capacity=3)
+
+# All 21 possible progress bars, built once — no string math per update
+_BARS = ["█" * k + "░" * (20 - k) for k in range(21)]
 
 
 # ── Low-level API helpers ─────────────────────────────────────────
@@ -35,109 +155,108 @@ _RATE_LIMIT_COOLDOWN = 70   # seconds to wait before retrying API after 429
 def _profile_returns_404(username: str) -> bool:
     """HEAD request to profile URL. Returns True if 404 (account does not exist)."""
     url = f"https://www.instagram.com/{username}/"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
-        "Accept": "text/html",
-    }
-    if _cookies.ig_cookies:
-        headers["Cookie"] = _cookies.ig_cookies
     try:
-        req = urllib.request.Request(url, headers=headers, method="HEAD")
-        with urllib.request.urlopen(req, timeout=8, context=_cookies.ssl_ctx) as resp:
-            return resp.status == 404
-    except urllib.error.HTTPError as e:
-        return e.code == 404
+        _bucket.acquire()
+        resp = _session.head(url, headers=_HDR_HEAD, timeout=8)
+        return resp.status_code == 404
     except Exception:
         return False
 
 
-def _fetch_profile_page(username: str) -> tuple[bool, bool]:
+# The profile page embeds the profile JSON inline — pull is_private out of
+# it directly so _check_pending can skip the second web_profile_info call.
+# Bytes pattern: the page is scanned raw, without a UTF-8 decode pass.
+_IS_PRIVATE_RE = re.compile(rb'"is_private":\s*(true|false)')
+
+# One combined alternation per category = one linear scan of the page,
+# instead of a separate O(page) pass per sentinel substring
+_UNAVAIL_RE = re.compile(
+    rb"Sorry, this page isn't available"
+    rb"|this page isn't available"
+    rb"|page isn't available"
+    rb"|User not found"
+    rb"|The link you followed may be broken"
+    rb"|link you followed may be broken"
+)
+_CONFIRM_RE = re.compile(rb'profilePage_|logging_page_id|"profile_id":')
+
+
+def _fetch_profile_page(username: str) -> tuple[bool, bool, bool | None]:
     """
-    Fetch profile page HTML. Returns (unavailable, confirms_exists).
+    Fetch profile page HTML. Returns (unavailable, confirms_exists, is_private).
     unavailable: True if page says account is deleted/unavailable or 404.
     confirms_exists: True if page contains profilePage_ (real profile).
+    is_private: parsed from the embedded profile JSON, or None if absent.
     No HEAD before GET — HEAD can cause Instagram to return a stub page on the GET.
     """
     url = f"https://www.instagram.com/{username}/"
-    # Same headers as direct GET that returns full page (profilePage_)
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
-        "Accept": "text/html",
-    }
-    if _cookies.ig_cookies:
-        headers["Cookie"] = _cookies.ig_cookies
 
     def _do_fetch():
         try:
-            req = urllib.request.Request(url, headers=headers)
-            with urllib.request.urlopen(req, timeout=10, context=_cookies.ssl_ctx) as resp:
-                if resp.status != 200:
-                    return (True, False, "")
-                html = resp.read().decode("utf-8", errors="ignore")
-                unavail = (
-                    "Sorry, this page isn't available" in html
-                    or "this page isn't available" in html
-                    or "page isn't available" in html
-                    or "User not found" in html
-                    or "The link you followed may be broken" in html
-                    or "link you followed may be broken" in html
-                )
-                confirms = (
-                    "profilePage_" in html
-                    or "logging_page_id" in html
-                    or '"profile_id":' in html
-                )
-                return (unavail, confirms, html)
-        except urllib.error.HTTPError as e:
-            return (e.code == 404, False, "")
+            _bucket.acquire()
+            resp = _session.get(url, headers=_HDR_PAGE, timeout=10)
+            if resp.status_code != 200:
+                return (resp.status_code == 404, False, b"")
+            # Scan the raw bytes — the 100-300 KB page never needs decoding
+            html = resp.content
+            unavail  = _UNAVAIL_RE.search(html) is not None
+            confirms = _CONFIRM_RE.search(html) is not None
+            return (unavail, confirms, html)
         except Exception:
-            return (False, False, "")
+            return (False, False, b"")
 
     unavail, confirms, html = _do_fetch()
     for _ in range(2):
         if unavail or confirms:
             break
+        if _rate_limited.is_set():
+            # Retries would just burn the cooldown window on more 429s
+            break
         time.sleep(random.uniform(1.0, 1.8))
         unavail, confirms, html = _do_fetch()
-    return (unavail, confirms)
+
+    is_private = None
+    if confirms and html:
+        m = _IS_PRIVATE_RE.search(html)
+        if m:
+            is_private = m.group(1) == b"true"
+    return (unavail, confirms, is_private)
 
 
 def _profile_page_unavailable(username: str) -> bool:
     """Fetch profile page; return True if page says account is unavailable (deleted/deactivated)."""
-    unavail, _ = _fetch_profile_page(username)
+    unavail, _, _ = _fetch_profile_page(username)
     return unavail
 
 
 def _profile_page_confirms_exists(username: str) -> bool:
     """Fetch profile page; return True only if page clearly shows a real profile (profilePage_ etc.)."""
-    _, confirms = _fetch_profile_page(username)
+    _, confirms, _ = _fetch_profile_page(username)
     return confirms
 
 
 def _search_check(username: str):
     """Fallback search when the profile API is rate-limited. Returns user dict, False (not found), or None (error)."""
     url = f"https://www.instagram.com/web/search/topsearch/?query={username}&context=blended"
-    headers = {
-        "User-Agent":  "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
-        "Accept":      "*/*",
-        "x-ig-app-id": "936619743392459",
-    }
-    if _cookies.ig_cookies:
-        headers["Cookie"] = _cookies.ig_cookies
-    if _cookies.ig_csrf:
-        headers["X-CSRFToken"] = _cookies.ig_csrf
     try:
-        req = urllib.request.Request(url, headers=headers)
-        with urllib.request.urlopen(req, timeout=10, context=_cookies.ssl_ctx) as resp:
-            d     = json.loads(resp.read())
-            users = d.get("users", [])
-            match = next(
-                (u.get("user", {}) for u in users if u.get("user", {}).get("username") == username),
-                None,
-            )
-            if match is None or not _is_valid_user(match, required_username=username):
-                return False
-            return match
+        _bucket.acquire()
+        resp = _session.get(url, headers=_HDR_SEARCH, timeout=10)
+        if resp.status_code != 200:
+            return None
+        raw = resp.content
+        # Cheap bytes scan first: most lookups are misses, and a miss means
+        # the full top-search payload never needs JSON-decoding
+        if f'"username":"{username}"'.encode() not in raw:
+            return False
+        d     = _loads(raw)
+        users = d.get("users", [])
+        match = next(
+            (u.get("user", {}) for u in users if u.get("user", {}).get("username") == username),
+            None,
+        )
+        if match is None or not _is_valid_user(match, required_username=username):
+            return False
+        return match
     except Exception:
         return None
 
@@ -162,85 +281,81 @@ def _is_valid_user(user, required_username: str = None) -> bool:
 def _fetch_user(username: str):
     """Fetch full profile info for a username. Returns user dict, None (deleted/invalid), {} (error), or 'RATE_LIMITED'."""
     if _rate_limited.is_set():
-        if time.time() < _rate_limited_until:
+        if time.time() < _cooldown[0]:
             return "RATE_LIMITED"
         _rate_limited.clear()
-    time.sleep(random.uniform(1.0, 2.0))
     url = f"https://www.instagram.com/api/v1/users/web_profile_info/?username={username}"
-    headers = {
-        "User-Agent":        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
-        "Accept":            "*/*",
-        "Accept-Language":   "en-US,en;q=0.9",
-        "x-ig-app-id":       "936619743392459",
-        "X-Requested-With":  "XMLHttpRequest",
-        "Referer":           f"https://www.instagram.com/{username}/",
-        "Origin":            "https://www.instagram.com",
-    }
-    if _cookies.ig_cookies:
-        headers["Cookie"] = _cookies.ig_cookies
-    if _cookies.ig_csrf:
-        headers["X-CSRFToken"] = _cookies.ig_csrf
+    headers = _HDR_WEB_PROFILE.copy()
+    headers["Referer"] = f"https://www.instagram.com/{username}/"
     try:
-        req = urllib.request.Request(url, headers=headers)
-        with urllib.request.urlopen(req, timeout=12, context=_cookies.ssl_ctx) as resp:
-            raw = resp.read()
-            data = json.loads(raw)
-            user = data.get("data") or {}
-            if not isinstance(user, dict):
-                return None
-            user = user.get("user")
-            if not _is_valid_user(user, required_username=username):
-                return None
-            return user
-    except urllib.error.HTTPError as e:
-        if e.code in (401, 429):
-            globals()["_rate_limited_until"] = time.time() + _RATE_LIMIT_COOLDOWN
+        _bucket.acquire()
+        resp = _session.get(url, headers=headers, timeout=12)
+        if resp.status_code in (401, 429):
+            with _cooldown_lock:
+                _cooldown[0] = max(_cooldown[0], time.time() + _RATE_LIMIT_COOLDOWN)
             _rate_limited.set()
+            _bucket.throttle()
             return "RATE_LIMITED"
-        if e.code in (404, 400):
+        if resp.status_code in (404, 400):
             return None
-        try:
-            body = e.read()
-            data = json.loads(body)
-            if data.get("message") or data.get("user") is None:
-                return None
-        except Exception:
-            pass
-        return {}
+        if resp.status_code != 200:
+            try:
+                data = _loads(resp.content)
+                if data.get("message") or data.get("user") is None:
+                    return None
+            except Exception:
+                pass
+            return {}
+        data = _loads(resp.content)
+        user = data.get("data") or {}
+        if not isinstance(user, dict):
+            return None
+        user = user.get("user")
+        if not _is_valid_user(user, required_username=username):
+            return None
+        return user
     except Exception:
         return {}
 
 
 # ── Per-account check functions (used as thread workers) ──────────
 
-def _check_existence(args):
-    """Account exists if profilePage_ in page. Without session: no profilePage_ → REMOVE (except on Render: only remove when unavail)."""
+def _check_existence(args, has_session: bool | None = None):
+    """Account exists if profilePage_ in page. Without session: no profilePage_ → REMOVE (except on Render: only remove when unavail).
+
+    has_session is snapshotted once by verify_accounts and passed in;
+    None (standalone use) falls back to reading the cookie module.
+    """
     username, ts = args
-    time.sleep(random.uniform(0.2, 0.4))
-    unavail, confirms = _fetch_profile_page(username)
+    unavail, confirms, _ = _fetch_profile_page(username)
     if unavail:
         return (username, ts, False, False)
     if confirms:
         return (username, ts, True, False)
-    has_session = getattr(_cookies, "has_logged_in_session", False)
+    if has_session is None:
+        has_session = getattr(_cookies, "has_logged_in_session", False)
     # On Render (and similar), Instagram returns generic page for everyone without session → don't remove unless unavail
     if not has_session and _verification_conservative:
         return (username, ts, True, False)
     return (username, ts, False, False)
 
 
-def _check_pending(args):
+def _check_pending(args, has_session: bool | None = None):
     username, ts = args
-    time.sleep(random.uniform(0.2, 0.4))
-    unavail, confirms = _fetch_profile_page(username)
+    if has_session is None:
+        has_session = getattr(_cookies, "has_logged_in_session", False)
+    unavail, confirms, page_private = _fetch_profile_page(username)
     if unavail:
         return (username, ts, False, None)
-    if not getattr(_cookies, "has_logged_in_session", False):
+    if not has_session:
         if _verification_conservative:
             return (username, ts, True, True)
         if not confirms:
             return (username, ts, False, None)
-        return (username, ts, True, True)
+        return (username, ts, True, page_private if page_private is not None else True)
+    if page_private is not None:
+        # The page already told us — skip the second web_profile_info call
+        return (username, ts, True, page_private)
     user = _fetch_user(username)
     if user == "RATE_LIMITED":
         result = _search_check(username)
@@ -283,68 +398,89 @@ def verify_accounts(
     kept            = []
     removed_missing = 0
     removed_public  = 0
+    _sync_session_cookies()
     _rate_limited.clear()
-    workers = min(total, 5)
+    _bucket.reset()
+    # Snapshot once — the session state can't change mid-verify, so workers
+    # shouldn't re-read the cookie module attribute per account
+    has_session = getattr(_cookies, "has_logged_in_session", False)
+
+    # One network check per unique username; results fan back out to every
+    # timestamp carrying that name, so duplicates cost nothing extra.
+    by_user: dict = defaultdict(list)
+    for name, ts in items:
+        by_user[name].append(ts)
+    unique  = len(by_user)
+    workers = min(unique, _WORKERS)
 
     if not require_private:
         phase = "Checking who's not following back..."
-        report(phase, 0, total)
+        report(phase, 0, unique)
         print(f"\n🔍 Checking existence of {total} accounts ({label}) — {workers} threads in parallel...")
-        results    = {}
         rate_warned = False
         with ThreadPoolExecutor(max_workers=workers) as executor:
-            futures = {executor.submit(_check_existence, item): item for item in items}
-            done    = 0
+            check      = partial(_check_existence, has_session=has_session)
+            futures    = {executor.submit(check, (name, tss[0])): name for name, tss in by_user.items()}
+            done       = 0
+            last_print = 0.0
             for future in as_completed(futures):
-                name, ts, exists, _ = future.result()
-                results[(name, ts)] = exists
+                name, _, exists, _ = future.result()
+                # Partition as results arrive — no second pass over a dict
+                for ts in by_user[name]:
+                    if exists:
+                        kept.append((name, ts))
+                    else:
+                        removed_missing += 1
                 done += 1
-                report(phase, done, total)
+                report(phase, done, unique)
                 if _rate_limited.is_set() and not rate_warned:
                     rate_warned = True
                     print(f"\n   ⛔  Instagram is rate-limiting requests (HTTP 401/429) — remaining accounts are kept", flush=True)
-                status = "✅" if exists else "❌ not found"
-                bar    = "█" * int(done / total * 20) + "░" * (20 - int(done / total * 20))
-                print(f"\r   [{bar}] {done}/{total}  {status} @{name:<25}", end="", flush=True)
+                # Throttle the tty write to ~10 Hz; the progress callback
+                # above still fires every completion (cheap Python call)
+                now = time.monotonic()
+                if now - last_print > 0.1 or done == unique:
+                    last_print = now
+                    status = "✅" if exists else "❌ not found"
+                    bar    = _BARS[done * 20 // unique]
+                    print(f"\r   [{bar}] {done}/{unique}  {status} @{name:<25}", end="", flush=True)
         print()
-        for (n, ts), exists in results.items():
-            if exists:
-                kept.append((n, ts))
-            else:
-                removed_missing += 1
     else:
         phase = "Checking pending requests..."
-        report(phase, 0, total)
+        report(phase, 0, unique)
         print(f"\n🔍 Checking {total} pending accounts...")
-        results = {}
         with ThreadPoolExecutor(max_workers=workers) as executor:
-            futures = {executor.submit(_check_pending, item): item for item in items}
-            done    = 0
+            check      = partial(_check_pending, has_session=has_session)
+            futures    = {executor.submit(check, (name, tss[0])): name for name, tss in by_user.items()}
+            done       = 0
+            last_print = 0.0
             for future in as_completed(futures):
-                name, ts, exists, is_private = future.result()
-                results[(name, ts)] = (exists, is_private)
+                name, _, exists, is_private = future.result()
+                for ts in by_user[name]:
+                    if not exists:
+                        removed_missing += 1
+                    elif is_private is False:
+                        removed_public += 1
+                    else:
+                        kept.append((name, ts))
                 done += 1
-                report(phase, done, total)
-                if not exists:
-                    status = "❌ not found"
-                elif is_private is False:
-                    status = "🔓 public (old request)"
-                elif is_private is True:
-                    status = "✅ private"
-                else:
-                    status = "✅ (API error — kept)"
-                bar = "█" * int(done / total * 20) + "░" * (20 - int(done / total * 20))
-                print(f"\r   [{bar}] {done}/{total}  {status} @{name:<25}", end="", flush=True)
+                report(phase, done, unique)
+                now = time.monotonic()
+                if now - last_print > 0.1 or done == unique:
+                    last_print = now
+                    if not exists:
+                        status = "❌ not found"
+                    elif is_private is False:
+                        status = "🔓 public (old request)"
+                    elif is_private is True:
+                        status = "✅ private"
+                    else:
+                        status = "✅ (API error — kept)"
+                    bar = _BARS[done * 20 // unique]
+                    print(f"\r   [{bar}] {done}/{unique}  {status} @{name:<25}", end="", flush=True)
         if _rate_limited.is_set():
             print(f"\n   ⛔  Instagram is rate-limiting — some results may be inaccurate", flush=True)
         print()
-        for (n, ts), (exists, is_private) in results.items():
-            if not exists:
-                removed_missing += 1
-            elif is_private is False:
-                removed_public += 1
-            else:
-                kept.append((n, ts))
 
     if removed_missing:
         print(f"   🗑  Removed {removed_missing} accounts that no longer exist")
@@ -6,6 +6,6 @@ Ensures: single top-level folder 'connections', only followers_and_following wit
 required files present, size within limit. Never raises — returns (ok, errors).
 """
 
-from .validator import validate_zip
+from .validator import open_validated, validate_zip, validate_zipfile
 
-__all__ = ["validate_zip"]
+__all__ = ["open_validated", "validate_zip", "validate_zipfile"]
@@ -15,71 +15,131 @@ REQUIRED_FILES = [
     "connections/followers_and_following/pending_follow_requests.json",
 ]
 
+# Zip-bomb guard: reject archives whose declared uncompressed size is absurd
+# for a followers/following export (the upload itself is capped at 5 MB).
+# Checked from the central directory — no member bytes are ever read.
+MAX_UNCOMPRESSED_BYTES = 200 * 1024 * 1024
+MAX_MEMBER_BYTES = 100 * 1024 * 1024
+
+
+_BACKSLASH_TRANS = str.maketrans("\\", "/")
+
 
 def _normalize(name: str) -> str:
-    return name.lstrip("/").replace("\\", "/")
+    # translate + lstrip: one scan and at most one new string when the name
+    # is already clean, vs. the two allocations of lstrip().replace()
+    return name.translate(_BACKSLASH_TRANS).lstrip("/")
 
 
-def _top_level_dirs(names: list[str]) -> set[str]:
-    out = set()
-    for n in names:
-        n = _normalize(n)
-        if not n or n == ".":
-            continue
-        parts = n.split("/")
-        if parts[0]:
-            out.add(parts[0])
-    return out
-
-
-def _files_in_subdir(names: list[str], subdir: str) -> list[str]:
-    subdir = _normalize(subdir).rstrip("/") + "/"
-    out = []
-    for n in names:
-        n = _normalize(n)
-        if n.startswith(subdir) and "/" in n[len(subdir):]:
-            continue
-        if n.startswith(subdir) and not n.endswith("/"):
-            out.append(n)
-    return out
 
 
-def _has_non_json_in_subdir(names: list[str], subdir: str) -> list[str]:
-    bad = []
-    for n in _files_in_subdir(names, subdir):
-        if not n.lower().endswith(".json"):
-            bad.append(n.split("/")[-1])
-    return bad
+class _OwningZipFile(zipfile.ZipFile):
+    """ZipFile over a file object we opened ourselves: close() also closes
+    the underlying file (plain ZipFile leaves passed-in files open)."""
 
+    def close(self):
+        fp = self.fp
+        try:
+            super().close()
+        finally:
+            if fp is not None:
+                fp.close()
 
-def validate_zip(zip_path: str, max_bytes: int) -> tuple[bool, list[str] | None]:
+
+def open_validated(zip_path: str, max_bytes: int) -> tuple[zipfile.ZipFile | None, list[str] | None]:
     """
-    Validate ZIP path. Returns (True, None) if valid, else (False, list of error strings).
+    Open the ZIP once and validate it. Returns (ZipFile, None) if valid —
+    caller owns and must close the ZipFile — else (None, list of errors).
     Does not raise; catches exceptions and returns them as error messages.
     """
     errors: list[str] = []
 
+    # One open + fstat on the handle instead of isfile/getsize/open —
+    # a single syscall round and the OS page cache is primed once
     try:
-        if not os.path.isfile(zip_path):
-            return False, ["File not found or not a file."]
+        fp = open(zip_path, "rb")
+    except (FileNotFoundError, IsADirectoryError):
+        return None, ["File not found or not a file."]
+    except Exception as e:
+        return None, [f"Could not read file: {e!s}"]
 
-        size = os.path.getsize(zip_path)
+    try:
+        size = os.fstat(fp.fileno()).st_size
         if size > max_bytes:
             mb = max_bytes / (1024 * 1024)
             errors.append(f"File size ({size / (1024*1024):.1f} MB) exceeds the maximum allowed ({mb:.0f} MB). Request a smaller date range in Instagram.")
+            fp.close()
+            return None, errors
 
-        with zipfile.ZipFile(zip_path, "r") as z:
-            names = z.namelist()
+        z = _OwningZipFile(fp, "r")
     except zipfile.BadZipFile:
-        return False, ["File is not a valid ZIP archive."]
+        fp.close()
+        return None, ["File is not a valid ZIP archive."]
     except Exception as e:
-        return False, [f"Could not read file: {e!s}"]
+        fp.close()
+        return None, [f"Could not read file: {e!s}"]
 
+    errors = validate_zipfile(z)
     if errors:
+        z.close()
+        return None, errors
+    return z, None
+
+
+def validate_zip(zip_path: str, max_bytes: int) -> tuple[bool, list[str] | None]:
+    """
+    Validate ZIP path. Returns (True, None) if valid, else (False, list of error strings).
+    Does not raise; catches exceptions and returns them as error messages.
+    """
+    z, errors = open_validated(zip_path, max_bytes)
+    if z is None:
         return False, errors
+    z.close()
+    return True, None
 
-    normalized = [_normalize(n) for n in names]
-    top_dirs = _top_level_dirs(normalized)
+
+def validate_zipfile(z: zipfile.ZipFile) -> list[str] | None:
+    """
+    Structural checks on an already-open ZipFile (central directory only —
+    no member is extracted or read). Returns None if valid, else errors.
+    """
+    errors: list[str] = []
+
+    # Single pass over the ZipInfo list (already parsed from the central
+    # directory): collect top-level dirs, flag foreign Connections
+    # subfolders, spot non-JSON files in the needed subdir, record presence
+    # of the required files, and sum declared sizes for the zip-bomb guard.
+    allowed_prefix = REQUIRED_SUBDIR + "/"
+    top_dirs: set[str] = set()
+    present: set[str] = set()
+    non_json: list[str] = []
+    has_bad_prefix = False
+    total_uncompressed = 0
+    for zi in z.infolist():
+        if zi.file_size > MAX_MEMBER_BYTES:
+            return [
+                f"ZIP contains an entry that expands to {zi.file_size / (1024*1024):.0f} MB — too large to process safely. "
+                "Export only 'Followers and following' to keep the file small."
+            ]
+        total_uncompressed += zi.file_size
+        n = _normalize(zi.filename)
+        if not n or n == ".":
+            continue
+        top_dirs.add(n.split("/", 1)[0])
+        present.add(n)
+        if n.endswith("/") or n == REQUIRED_TOP_DIR or n == REQUIRED_SUBDIR:
+            continue
+        if n.startswith(REQUIRED_TOP_DIR + "/") and not n.startswith(allowed_prefix):
+            has_bad_prefix = True
+        elif n.startswith(allowed_prefix) and "/" not in n[len(allowed_prefix):]:
+            if not n.lower().endswith(".json"):
+                non_json.append(n.rsplit("/", 1)[-1])
+
+    if total_uncompressed > MAX_UNCOMPRESSED_BYTES:
+        return [
+            f"ZIP expands to {total_uncompressed / (1024*1024):.0f} MB — too large to process safely. "
+            "Export only 'Followers and following' to keep the file small."
+        ]
 
     if top_dirs != {REQUIRED_TOP_DIR}:
         if not top_dirs:
@@ -94,25 +154,19 @@ def validate_zip(zip_path: str, max_bytes: int) -> tuple[bool, list[str] | None]
                 f"Your ZIP has {n_extra} other folder{'s' if n_extra != 1 else ''} too."
             )
 
-    allowed_prefix = REQUIRED_SUBDIR + "/"
-    for n in normalized:
-        if n.endswith("/") or n == REQUIRED_TOP_DIR or n == REQUIRED_SUBDIR:
-            continue
-        if n.startswith(REQUIRED_TOP_DIR + "/") and not n.startswith(allowed_prefix):
-            errors.append(
-                "The tool needs only 'Connections' → 'followers and following'. "
-                "Your export includes other Connection types (e.g. contacts)."
-            )
-            break
+    if has_bad_prefix:
+        errors.append(
+            "The tool needs only 'Connections' → 'followers and following'. "
+            "Your export includes other Connection types (e.g. contacts)."
+        )
 
-    non_json = _has_non_json_in_subdir(normalized, REQUIRED_SUBDIR)
     if non_json:
         errors.append(
             "The tool reads JSON only. Your file has HTML. "
             "You must choose JSON as the format when creating the export (Step 5: date range and format)."
         )
 
-    missing = [req.split("/")[-1] for req in REQUIRED_FILES if not any(_normalize(n) == req for n in names)]
+    missing = [req.rsplit("/", 1)[-1] for req in REQUIRED_FILES if req not in present]
     if missing:
         errors.append(f"Required file(s) missing: {', '.join(missing)}. Usually caused by wrong format (need JSON) or wrong selection (need only Connections).")
 
@@ -123,5 +177,5 @@ def validate_zip(zip_path: str, max_bytes: int) -> tuple[bool, list[str] | None]
         )
 
     if errors:
-        return False, errors
-    return True, None
+        return errors
+    return None